@@ -1,2 +1,14 @@
+import framework
+from framework.main import TEMPLATE_DIR, load_config
+
+
 def pytest_addoption(parser):
     parser.addoption("--conf", action="append", default=[])
+
+
+def pytest_configure(config):
+    # pytest-xdist workers run in fresh processes, so the configuration
+    # loaded by noobaa-sa-ci has to be loaded again on each of them
+    if hasattr(config, "workerinput"):
+        load_config(config.getoption("--conf"))
+        framework.config.ENV_DATA["template_dir"] = TEMPLATE_DIR
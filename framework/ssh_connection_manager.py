@@ -33,6 +33,8 @@ class SSHConnectionManager:
 
         """
         # Initialize the connection only if it hasn't been created yet
+        if hasattr(self, "_conn"):
+            return
         self._conn = None
         self.host = config.ENV_DATA["noobaa_sa_host"]
         self.user = config.ENV_DATA["user"]
@@ -2,13 +2,13 @@
 Module which contain account operations like create, delete, list and update
 """
 
+import json
 import logging
 import os
 import tempfile
 from abc import ABC, abstractmethod
 
 from common_ci_utils.random_utils import generate_unique_resource_name
-from common_ci_utils.templating import Templating
 
 from framework import config
 from framework.ssh_connection_manager import SSHConnectionManager
@@ -18,8 +18,13 @@ from noobaa_sa.exceptions import (
     AccountCreationFailed,
     AccountDeletionFailed,
     AccountListFailed,
+    AccountUpdateFailed,
+)
+from utility.utils import (
+    generate_random_key,
+    get_noobaa_sa_host_home_path,
+    render_template,
 )
-from utility.utils import generate_random_key, get_noobaa_sa_host_home_path
 
 log = logging.getLogger(__name__)
 
@@ -102,12 +107,7 @@ class NSFSAccount(Account):
         hd = get_noobaa_sa_host_home_path()
         bucket_path = os.path.join(hd, f"fs_{account_name}")
 
-        # create bucket path
-        cmd = f"sudo mkdir {bucket_path}"
-        self.conn.exec_cmd(cmd)
-
         # form the account json file
-        templating = Templating(base_path=config.ENV_DATA["template_dir"])
         account_template = "account.json"
         account_data = {
             "account_name": account_name,
@@ -116,7 +116,7 @@ class NSFSAccount(Account):
             "bucket_path": bucket_path,
             "fs_backend": fs_backend,
         }
-        account_data_full = templating.render_template(account_template, account_data)
+        account_data_full = render_template(account_template, account_data)
         log.info(f"account content: {account_data_full}")
 
         # write to file
@@ -125,9 +125,15 @@ class NSFSAccount(Account):
         ) as account_file:
             account_file.write(account_data_full)
 
+        # create bucket path and the upload dir in a single remote call
+        account_file_dir = os.path.dirname(account_file.name)
+        cmd = (
+            f"sudo mkdir {bucket_path}; "
+            f"sudo mkdir -p {account_file_dir} && sudo chmod a+w {account_file_dir}"
+        )
+        self.conn.exec_cmd(cmd)
+
         # upload to noobaa-sa host
-        self.conn.exec_cmd(f"sudo mkdir -p {os.path.dirname(account_file.name)}")
-        self.conn.exec_cmd(f"sudo chmod a+w {os.path.dirname(account_file.name)}")
         self.conn.upload_file(account_file.name, account_file.name)
 
         if config_root is None:
@@ -150,6 +156,9 @@ class NSFSAccount(Account):
         Args:
             config_root (str): Path to config root
 
+        Returns:
+            list: Names of the accounts
+
         """
         if config_root is None:
             config_root = self.config_root
@@ -159,6 +168,8 @@ class NSFSAccount(Account):
         log.info(stdout)
         if retcode != 0:
             raise AccountListFailed(f"Listing of accounts failed with error {stderr}")
+        account_ls = json.loads(stdout)["response"]["reply"]
+        return [item["name"] for item in account_ls]
 
     def delete(self, account_name=None, config_root=None):
         """
@@ -179,16 +190,41 @@ class NSFSAccount(Account):
         if retcode != 0:
             raise AccountDeletionFailed(f"Deleting account failed with error {stderr}")
 
-    def update(self, account_json):
+    def update(self, account_name, config_root=None, **kwargs):
         """
         Account update
 
         Args:
-            account_json (str): Path to account json file
+            account_name (str): Name of the account to be updated
+            config_root (str): Path to config root
+
+            Supported update options via kwargs:
+            new_name (str): Update the account name
+            regenerate (bool): Regenerate the access and secret keys of the account
+
+        Example usage:
+            account_manager.update(account_name, regenerate=True)
+
+        Returns:
+            dict: The updated account info as replied by the CLI
 
         """
-        # TODO: Implement update operation
-        raise NotImplementedError("Account update functionality is not implemented")
+        if config_root is None:
+            config_root = self.config_root
+        update_cmd = ""
+        if "new_name" in kwargs:
+            update_cmd = update_cmd + f"--new_name {kwargs.get('new_name')} "
+        if kwargs.get("regenerate"):
+            update_cmd = update_cmd + "--regenerate "
+        log.info(f"Updating account {account_name} for NSFS deployment")
+        cmd = f"sudo {self.manage_nsfs} account update --name {account_name} {update_cmd}--config_root {config_root} {constants.UNWANTED_LOG}"
+        retcode, stdout, stderr = self.conn.exec_cmd(cmd)
+        if retcode != 0:
+            raise AccountUpdateFailed(
+                f"Updating account {account_name} failed with error {stderr}"
+            )
+        log.info("Account updated successfully")
+        return json.loads(stdout)["response"]["reply"]
 
 
 class DBAccount(Account):
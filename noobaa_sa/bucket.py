@@ -27,6 +27,9 @@ class BucketManager:
         self.base_cmd = f"sudo {self.manage_nsfs}"
         self.unwanted_log = "2>/dev/null"
         self.conn = SSHConnectionManager().connection
+        # The config root of each bucket created by this manager,
+        # so only they are cleaned up
+        self.created_buckets = {}
 
     def create(self, account_name, bucket_name, config_root=None):
         """
@@ -54,6 +57,7 @@ class BucketManager:
         retcode, stdout, stderr = self.conn.exec_cmd(cmd)
         if retcode != 0:
             raise e.BucketCreationFailed(f"Failed to create bucket {stderr}")
+        self.created_buckets[bucket_name] = config_root
         log.info("Bucket created successfully")
 
     def list(self, config_root=None):
@@ -96,6 +100,7 @@ class BucketManager:
         retcode, stdout, stderr = self.conn.exec_cmd(cmd)
         if retcode != 0:
             raise e.BucketDeletionFailed(f"Deleting bucket failed with error {stderr}")
+        self.created_buckets.pop(bucket_name, None)
         log.info(stdout)
         log.info("Bucket deleted successfully")
 
@@ -132,6 +137,10 @@ class BucketManager:
             raise e.BucketUpdateFailed(
                 f'Failed to update bucket "{bucket_name}" with error {stderr}'
             )
+        if "new_name" in self.update_data and bucket_name in self.created_buckets:
+            self.created_buckets[self.update_data["new_name"]] = (
+                self.created_buckets.pop(bucket_name)
+            )
         log.info(stdout)
         log.info("Bucket info updated successfully")
         # TODO: Implement --bucket_policy update operation
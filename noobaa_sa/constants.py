@@ -10,5 +10,18 @@ DEFAULT_FS_BACKEND = "GPFS"
 UNWANTED_LOG = "2>/dev/null"
 DEFAULT_NSFS_PORT = 6443
 DEFAULT_CONFIG_ROOT_PATH = "/etc/noobaa.conf.d"
+CONFIG_DIR_REDIRECT_PATH = f"{DEFAULT_CONFIG_ROOT_PATH}/config_dir_redirect"
 EXPECTED_ACCESS_KEY_LEN = 20
 EXPECTED_SECRET_KEY_LEN = 40
+S3_MAX_POOL_CONNECTIONS = 50
+S3_MAX_RETRY_ATTEMPTS = 3
+MULTIPART_UPLOAD_MAX_WORKERS = 8
+# S3 requires all the parts but the last to be at least 5M
+MULTIPART_MIN_PART_SIZE = "5M"
+DEFAULT_MULTIPART_PART_SIZE = "16M"
+# NSFS returns md5 based ETags only when md5 calculation is enabled,
+# and mtime and inode based ones otherwise
+MD5_MULTIPART_ETAG_REGEX = r"^[0-9a-f]{32}-\d+$"
+# Local testing directories are kept in RAM when there's enough room for them
+LOCAL_RAMDISK_DIR = "/dev/shm"
+LOCAL_RAMDISK_MIN_FREE_SPACE = "1G"
@@ -10,6 +10,10 @@ class AccountDeletionFailed(Exception):
     pass
 
 
+class AccountUpdateFailed(Exception):
+    pass
+
+
 class InvalidDeploymentType(Exception):
     pass
 
@@ -68,3 +72,7 @@ class UnexpectedBehaviour(Exception):
 
 class NoSuchKey(Exception):
     pass
+
+
+class ObjectListFailed(Exception):
+    pass
@@ -1,21 +1,26 @@
 import logging
 import os
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
 import boto3
-from boto3.s3.transfer import TransferConfig
+from boto3.s3.transfer import TransferConfig, create_transfer_manager
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from common_ci_utils.random_utils import (
     generate_random_files,
     generate_unique_resource_name,
+    parse_size_to_bytes,
 )
 
+from noobaa_sa import constants
 from noobaa_sa.exceptions import (
     BucketCreationFailed,
     BucketNotEmpty,
     NoSuchBucket,
     BucketAlreadyExists,
     NoSuchKey,
+    ObjectListFailed,
     UnexpectedBehaviour,
 )
 
@@ -36,7 +41,7 @@ class S3Client:
 
     static_tls_crt_path = ""
 
-    def __init__(self, endpoint, access_key, secret_key, verify_tls=True):
+    def __init__(self, endpoint, access_key, secret_key, verify_tls=True, config=None):
         """
 
         Args:
@@ -44,6 +49,8 @@ class S3Client:
             access_key (str): The access key of the S3 account
             secret_key (str): The secret key of the S3 account
             verify_tls (bool): Whether to use secure connections via TLS
+            config (botocore.config.Config): Options to override the default
+                connection pool, retries and keepalive settings with
 
         """
         self.endpoint = endpoint
@@ -56,11 +63,21 @@ class S3Client:
         if self.verify_tls:
             os.environ["AWS_CA_BUNDLE"] = S3Client.static_tls_crt_path
 
+        # Keep a pool of reusable, kept alive connections so consecutive
+        # and concurrent calls don't pay for a new TCP+TLS handshake
+        boto3_config = Config(
+            max_pool_connections=constants.S3_MAX_POOL_CONNECTIONS,
+            retries={"max_attempts": constants.S3_MAX_RETRY_ATTEMPTS},
+            tcp_keepalive=True,
+        )
+        if config is not None:
+            boto3_config = boto3_config.merge(config)
         self._boto3_resource = boto3.resource(
             "s3",
             endpoint_url=self.endpoint,
             aws_access_key_id=self.access_key,
             aws_secret_access_key=self.secret_key,
+            config=boto3_config,
         )
         self._boto3_client = self._boto3_resource.meta.client
 
@@ -94,6 +111,23 @@ class S3Client:
 
         return response_dict if get_response else bucket_name
 
+    def create_buckets(self, amount):
+        """
+        Concurrently create buckets with random names in an S3 account
+
+        Args:
+            amount (int): The number of buckets to create
+
+        Returns:
+            list: The names of the created buckets
+
+        """
+        if amount <= 0:
+            return []
+        max_workers = min(constants.S3_MAX_POOL_CONNECTIONS, amount)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(lambda _: self.create_bucket(), range(amount)))
+
     def delete_bucket(self, bucket_name, empty_before_deletion=False):
         """
         Delete a bucket in an S3 account using boto3
@@ -165,15 +199,54 @@ class S3Client:
             get_response (bool): Whether to return the response dictionary or a list of object names
 
         Returns:
-            dict: A dictionary containing the response from the list_objects call.
+            dict: A dictionary containing the response from the first list_objects call,
+                  with the Contents of all the following pages if the listing was truncated.
                   Also includes the added ObjectNames and Code keys at the root level.
 
+        Raises:
+            ObjectListFailed: In case listing a following page of a truncated
+                listing fails
+
         """
         log.info(f"Listing objects in bucket {bucket_name} via boto3")
         list_objects_method = "list_objects_v2" if use_v2 else "list_objects"
         response_dict = self._exec_boto3_method(
             list_objects_method, Bucket=bucket_name, Prefix=prefix
         )
+
+        # Follow the continuation of truncated listings,
+        # which are limited to 1000 objects per page
+        page = response_dict
+        while page.get("IsTruncated"):
+            if use_v2:
+                pagination_kwargs = {
+                    "ContinuationToken": page["NextContinuationToken"]
+                }
+            else:
+                pagination_kwargs = {
+                    "Marker": page.get("NextMarker", page["Contents"][-1]["Key"])
+                }
+            page = self._exec_boto3_method(
+                list_objects_method,
+                Bucket=bucket_name,
+                Prefix=prefix,
+                **pagination_kwargs,
+            )
+            if page["Code"] != 200:
+                log.error(
+                    f"Failed to list the next page of objects in bucket {bucket_name}: "
+                    f"{page.get('Error')}"
+                )
+                raise ObjectListFailed(
+                    f"Listing objects in bucket {bucket_name} failed after "
+                    f"{len(response_dict.get('Contents', []))} objects "
+                    f"with error {page['Code']}"
+                )
+            response_dict.setdefault("Contents", []).extend(page.get("Contents", []))
+        # The merged response holds the whole listing
+        if "IsTruncated" in response_dict:
+            response_dict["IsTruncated"] = False
+
         listed_obs = [obj["Key"] for obj in response_dict.get("Contents", [])]
         response_dict["ObjectNames"] = listed_obs
         log.info(f"Listed objects: {listed_obs}")
@@ -223,6 +296,27 @@ class S3Client:
         )
         return response_dict
 
+    def head_object(self, bucket_name, object_key):
+        """
+        Get the metadata of an object in an S3 bucket using boto3,
+        without its contents
+
+        Args:
+            bucket_name (str): The name of the bucket
+            object_key (str): The key of the object
+
+        Returns:
+            dict: A dictionary containing the response from the head_object call,
+                  e.g. the "ETag" and "ContentLength" of the object.
+                  Also includes the added Code key at the root level.
+
+        """
+        log.info(f"Getting metadata of object {object_key} in bucket {bucket_name}")
+        response_dict = self._exec_boto3_method(
+            "head_object", Bucket=bucket_name, Key=object_key
+        )
+        return response_dict
+
     def delete_object(self, bucket_name, object_key):
         """
         Delete an object from an S3 bucket using boto3
@@ -292,6 +386,37 @@ class S3Client:
         )
         return response_dict
 
+    def upload_file(self, local_path, bucket_name, object_key, part_size=None):
+        """
+        Upload a file to an S3 bucket using the boto3 transfer manager,
+        which uploads files larger than the part size as multipart objects
+        with concurrent part uploads
+
+        Args:
+            local_path (str): The local file to upload
+            bucket_name (str): The name of the bucket to upload to
+            object_key (str): The key of the object to write
+            part_size (str): The size of the parts, e.g. "16M".
+                             If not specified, the boto3 defaults are used.
+
+        """
+        log.info(
+            f"Uploading file {local_path} to s3://{bucket_name}/{object_key} via boto3"
+        )
+        if part_size is None:
+            transfer_config = TransferConfig(use_threads=True)
+        else:
+            part_size_bytes = parse_size_to_bytes(part_size)
+            transfer_config = TransferConfig(
+                multipart_threshold=part_size_bytes,
+                multipart_chunksize=part_size_bytes,
+                max_concurrency=constants.MULTIPART_UPLOAD_MAX_WORKERS,
+                use_threads=True,
+            )
+        self._boto3_client.upload_file(
+            local_path, bucket_name, object_key, Config=transfer_config
+        )
+
     def upload_directory(self, local_dir, bucket_name, prefix=""):
         """
         Upload a directory to an S3 bucket using boto3
@@ -306,16 +431,26 @@ class S3Client:
             f"Uploading directory {local_dir} to s3://{bucket_name}/{prefix} via boto3"
         )
         transfer_config = TransferConfig(use_threads=True)
-        for root, _, files in os.walk(local_dir):
-            for filename in files:
-                local_path = os.path.join(root, filename)
-                relative_path = os.path.relpath(local_path, local_dir)
-                s3_path = os.path.join(prefix, relative_path)
-
-                print(f"Uploading {local_path} to {bucket_name}/{s3_path}")
-                self._boto3_client.upload_file(
-                    local_path, bucket_name, s3_path, Config=transfer_config
-                )
+        # Upload all the files concurrently via a single transfer manager
+        # which shares its thread pool between the files
+        futures = []
+        with create_transfer_manager(
+            self._boto3_client, transfer_config
+        ) as transfer_manager:
+            for root, _, files in os.walk(local_dir):
+                for filename in files:
+                    local_path = os.path.join(root, filename)
+                    relative_path = os.path.relpath(local_path, local_dir)
+                    s3_path = os.path.join(prefix, relative_path)
+
+                    print(f"Uploading {local_path} to {bucket_name}/{s3_path}")
+                    futures.append(
+                        transfer_manager.upload(local_path, bucket_name, s3_path)
+                    )
+
+            # Raise the first upload failure, if any
+            for future in futures:
+                future.result()
 
     def download_bucket_contents(self, bucket_name, local_dir, prefix=""):
         """
@@ -329,24 +464,39 @@ class S3Client:
 
         """
 
-        transfer_config = TransferConfig(use_threads=True)
+        # Objects larger than a part are downloaded in concurrent ranged GETs
+        part_size_bytes = parse_size_to_bytes(constants.DEFAULT_MULTIPART_PART_SIZE)
+        transfer_config = TransferConfig(
+            multipart_threshold=part_size_bytes,
+            multipart_chunksize=part_size_bytes,
+            use_threads=True,
+        )
 
         log.info(f"Downloading s3:///{bucket_name}/{prefix} to {local_dir} via boto3")
-        # List objects within the specified prefix
-        for obj in self.list_objects(bucket_name, prefix, use_v2=True):
-            # Construct the full local path
-            relative_path = os.path.relpath(obj, prefix)
-            local_file_path = os.path.join(local_dir, relative_path)
-
-            # Ensure local directory structure mirrors S3
-            local_file_dir = os.path.dirname(local_file_path)
-            if not os.path.exists(local_file_dir):
-                os.makedirs(local_file_dir)
-
-            print(f"Downloading {obj} to {local_file_path}")
-            self._boto3_client.download_file(
-                bucket_name, obj, local_file_path, Config=transfer_config
-            )
+        # Download all the objects concurrently via a single transfer manager
+        # which shares its thread pool between the objects and their ranges
+        futures = []
+        with create_transfer_manager(
+            self._boto3_client, transfer_config
+        ) as transfer_manager:
+            # List objects within the specified prefix
+            for obj in self.list_objects(bucket_name, prefix, use_v2=True):
+                # Construct the full local path
+                relative_path = os.path.relpath(obj, prefix)
+                local_file_path = os.path.join(local_dir, relative_path)
+
+                # Ensure local directory structure mirrors S3
+                local_file_dir = os.path.dirname(local_file_path)
+                os.makedirs(local_file_dir, exist_ok=True)
+
+                print(f"Downloading {obj} to {local_file_path}")
+                futures.append(
+                    transfer_manager.download(bucket_name, obj, local_file_path)
+                )
+
+            # Raise the first download failure, if any
+            for future in futures:
+                future.result()
 
     def put_random_objects(
         self,
@@ -450,7 +600,8 @@ class S3Client:
             object_name(str): The unique name of the S3 object.
             part_id (int): Part number
             upload_id (str): id generated by create_multipart_upload method
-            file_chunk (str): Chunk of file to be uploaded.
+            file_chunk (bytes|file): Chunk of file to be uploaded, as bytes or a
+                seekable file-like object.
 
         Returns:
             List: List contains all part information
@@ -481,7 +632,13 @@ class S3Client:
         return list_multipart
 
     def multipart_upload_part_copy(
-        self, bucket_name, key, copy_source, part_num, upload_id
+        self,
+        bucket_name,
+        key,
+        copy_source,
+        part_num,
+        upload_id,
+        copy_source_range=None,
     ):
         """
         Uploads a part by Copying data from existing object to new destination
@@ -489,18 +646,23 @@ class S3Client:
 
         Args:
             bucket_name (str): The name of the S3 bucket.
+            copy_source_range (str): The range of bytes to copy from the source object,
+                e.g. "bytes=0-1023". If not specified, the entire object is copied.
 
         Returns:
             Dict: Dictionary of responce generated by boto3 client
 
         """
-
+        copy_kwargs = {}
+        if copy_source_range:
+            copy_kwargs["CopySourceRange"] = copy_source_range
         upload_part_copy = self._boto3_client.upload_part_copy(
             Bucket=bucket_name,
             CopySource=copy_source,
             Key=key,
             PartNumber=part_num,
             UploadId=upload_id,
+            **copy_kwargs,
         )
         return upload_part_copy
 
@@ -581,7 +743,11 @@ class S3Client:
                   Also includes the added Code key at the root level.
 
         """
-        log.info(f"Executing boto3 method {method_name} with given arguments {kwargs}")
+        # Let logging format the arguments only if the record is emitted,
+        # since they may hold large objects bodies
+        log.info(
+            "Executing boto3 method %s with given arguments %s", method_name, kwargs
+        )
         response_dict = {}
         try:
             boto3_method = getattr(self._boto3_client, method_name)
@@ -590,7 +756,9 @@ class S3Client:
         except ClientError as e:
             response_dict = e.response
             response_dict["Code"] = e.response["Error"]["Code"]
-            log.warn(f"Failed to execute {method_name} with arguments {kwargs}: {e}")
+            log.warn(
+                "Failed to execute %s with arguments %s: %s", method_name, kwargs, e
+            )
 
         # Convert the response code to an int if possible for uniformity
         try:
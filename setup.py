@@ -11,9 +11,11 @@ setup(
     description="Noobaa Standalone(SA) CI is used to run test cases.",
     install_requires=[
         "common-ci-utils",
+        "filelock",
         "jinja2",
         "mergedeep",
         "pytest",
+        "pytest-xdist",
         "pynpm",
         "pyyaml",
         "requests",
@@ -1,9 +1,10 @@
 import os
 import logging
+import shutil
 import tempfile
 import pytest
 
-from common_ci_utils.command_runner import exec_cmd
+from filelock import FileLock
 from common_ci_utils.random_utils import (
     generate_random_hex,
     generate_unique_resource_name,
@@ -14,10 +15,13 @@ from noobaa_sa.factories import AccountFactory
 from noobaa_sa.bucket import BucketManager
 from framework import config
 from noobaa_sa.s3_client import S3Client
+from utility.bucket_utils import generate_multipart_origin_files
 from utility.utils import (
+    get_config_root_full_path,
+    get_dir_md5sums,
+    get_local_tmp_dir,
     get_env_config_root_full_path,
     get_current_test_name,
-    get_noobaa_sa_host_home_path,
 )
 from utility.nsfs_server_utils import (
     restart_nsfs_service,
@@ -44,31 +48,162 @@ def account_manager_implementation(account_json=None):
     return account_factory.get_account(account_json)
 
 
+@pytest.fixture(scope="session")
+def account_manager_session(account_json=None):
+    return account_manager_implementation(account_json)
+
+
+@pytest.fixture(scope="session")
+def template_account(request, account_manager_session):
+    """
+    Session scoped account which tests can get fresh credentials of
+    via fresh_account, instead of creating a new account each time.
+
+    Returns:
+        tuple: account_name, access_key and secret_key of the account as created.
+               The keys are no longer valid once fresh_account regenerated them.
+
+    """
+    account_name, access_key, secret_key = account_manager_session.create()
+
+    def account_cleanup():
+        account_manager_session.delete(account_name)
+
+    request.addfinalizer(account_cleanup)
+    return account_name, access_key, secret_key
+
+
+@pytest.fixture
+def fresh_account(template_account, account_manager):
+    """
+    Regenerate the keys of the session scoped template account,
+    which is cheaper than creating and deleting a new account.
+
+    Returns:
+        tuple: account_name, access_key and secret_key of the account
+
+    """
+    account_name = template_account[0]
+    account_info = account_manager.update(account_name, regenerate=True)
+    access_keys = account_info["access_keys"][0]
+    return account_name, access_keys["access_key"], access_keys["secret_key"]
+
+
+@pytest.fixture(scope="class")
+def bucket_manager_class(request):
+    return bucket_manager_implementation(request)
+
+
 @pytest.fixture
 def bucket_manager(request):
+    return bucket_manager_implementation(request)
+
+
+def bucket_manager_implementation(request):
     bucket_manager = BucketManager()
 
+    # Only delete the buckets this manager created, since other
+    # pytest-xdist workers may still use other buckets of the config root
     def bucket_cleanup():
-        for bucket in bucket_manager.list():
-            bucket_manager.delete(bucket, force=True)
+        for bucket, config_root in list(bucket_manager.created_buckets.items()):
+            bucket_manager.delete(bucket, config_root=config_root, force=True)
 
     request.addfinalizer(bucket_cleanup)
     return bucket_manager
 
 
 @pytest.fixture(scope="session")
-def set_nsfs_server_config_root(request):
+def ssh_conn():
+    """
+    Session scoped SSH connection to the Noobaa SA host.
+    The connection is established once and reused by all the tests.
+
+    Returns:
+        Connection: Connection to the Noobaa SA host
+
+    """
+    return SSHConnectionManager().connection
+
+
+@pytest.fixture(scope="session")
+def shared_session_dir(tmp_path_factory):
+    """
+    Local directory shared by all the pytest-xdist workers of the session.
+    Without pytest-xdist, this is the base temporary directory of the session.
+
+    Returns:
+        str: The full path of the shared directory
+
+    """
+    base_temp = tmp_path_factory.getbasetemp()
+    if os.environ.get("PYTEST_XDIST_WORKER"):
+        return str(base_temp.parent)
+    return str(base_temp)
+
+
+@pytest.fixture(scope="session")
+def nsfs_server_setup_lock(shared_session_dir):
+    """
+    File lock which serializes changes to the NSFS server setup
+    between the pytest-xdist workers of the session
+
+    Returns:
+        FileLock: The shared file lock
+
+    """
+    return FileLock(os.path.join(shared_session_dir, "nsfs_server_setup.lock"))
+
+
+@pytest.fixture(scope="session")
+def set_nsfs_server_config_root(
+    request, ssh_conn, nsfs_server_setup_lock, shared_session_dir
+):
     """
     Returns a function that allows
     configuring the NSFS service to use a custom config root dir
 
+    The config root redirect is cleared on teardown only by the last
+    pytest-xdist worker of the session to finish, so it isn't removed
+    while other workers still run tests against it.
+
     """
-    conn = SSHConnectionManager().connection
+    conn = ssh_conn
+    workers_count_path = os.path.join(
+        shared_session_dir, "nsfs_config_root_workers_count"
+    )
 
-    # Ensure to reset to the default config root on teardown
     def _clear_config_dir_redirect():
-        conn.exec_cmd("sudo rm -f /etc/noobaa.conf.d/config_dir_redirect")
-        restart_nsfs_service()
+        with nsfs_server_setup_lock:
+            conn.exec_cmd(f"sudo rm -f {constants.CONFIG_DIR_REDIRECT_PATH}")
+            restart_nsfs_service()
+
+    def _update_workers_count(delta):
+        """
+        Update the count of the workers using the NSFS config root redirect.
+        Should be called while holding the NSFS server setup lock.
+
+        Args:
+            delta (int): The number to add to the count
+
+        Returns:
+            int: The updated count
+
+        """
+        count = 0
+        if os.path.exists(workers_count_path):
+            with open(workers_count_path) as count_file:
+                count = int(count_file.read() or 0)
+        count += delta
+        with open(workers_count_path, "w") as count_file:
+            count_file.write(str(count))
+        return count
+
+    # Ensure to reset to the default config root on teardown,
+    # once no other worker uses it
+    def _release_config_dir_redirect():
+        with nsfs_server_setup_lock:
+            if _update_workers_count(-1) == 0:
+                _clear_config_dir_redirect()
 
     def _redirect_nsfs_service_to_use_custom_config_root(config_root):
         """
@@ -84,34 +219,71 @@ def set_nsfs_server_config_root(request):
             _clear_config_dir_redirect()
             return
 
-        # Skip if the provided config root path is already set
-        retcode, stdout, _ = conn.exec_cmd("cat /etc/noobaa.conf.d/config_dir_redirect")
-        if retcode == 0 and stdout.strip() == config_root:
-            return
-
-        # Make sure the provided config root path exists on the remote machine
-        retcode, _, _ = conn.exec_cmd(f"sudo mkdir -p {config_root}")
-        if retcode != 0:
-            raise FileNotFoundError(
-                "Failed to create the provided config root path on the remote machine"
+        # Check the current redirect, create the config root and set the redirect
+        # in a single remote call. Exit codes: 0 - the provided config root path
+        # is already set, 2 - the redirect was changed, other - failure
+        redirect_path = constants.CONFIG_DIR_REDIRECT_PATH
+        with nsfs_server_setup_lock:
+            retcode, _, stderr = conn.exec_cmd(
+                f"if [ \"$(cat {redirect_path} 2>/dev/null)\" = '{config_root}' ]; then exit 0; fi; "
+                f"sudo mkdir -p {config_root} || exit 1; "
+                f"echo '{config_root}' | sudo tee {redirect_path} > /dev/null || exit 1; "
+                "exit 2"
             )
+            if retcode == 0:
+                return
+            if retcode != 2:
+                raise FileNotFoundError(
+                    f"Failed to set the provided config root path on the remote machine: {stderr}"
+                )
+            restart_nsfs_service()
+
+    with nsfs_server_setup_lock:
+        _update_workers_count(1)
+    request.addfinalizer(_release_config_dir_redirect)
+    return _redirect_nsfs_service_to_use_custom_config_root
 
-        conn.exec_cmd(
-            f"echo '{config_root}' | sudo tee /etc/noobaa.conf.d/config_dir_redirect"
-        )
-        restart_nsfs_service()
 
-    request.addfinalizer(_clear_config_dir_redirect)
-    return _redirect_nsfs_service_to_use_custom_config_root
+@pytest.fixture(scope="session")
+def setup_nsfs_server_tls_cert(nsfs_server_setup_lock, shared_session_dir):
+    """
+    Returns a function that makes sure the NSFS server uses a TLS certificate
+    which the CI has locally. The local certificate is kept in the shared
+    session dir, so pytest-xdist workers reuse the certificate set up by
+    another worker instead of replacing it.
+
+    """
+    shared_tls_crt_path = os.path.join(shared_session_dir, "tls.crt")
+
+    def _setup_nsfs_server_tls_cert(config_root):
+        """
+        Setup the NSFS server TLS certificate if it's not already set up
+
+        Args:
+            config_root (str): The full path to the configuration root directory on the remote machine
+
+        """
+        with nsfs_server_setup_lock:
+            if not S3Client.static_tls_crt_path and os.path.exists(
+                shared_tls_crt_path
+            ):
+                S3Client.static_tls_crt_path = shared_tls_crt_path
+            if not check_nsfs_tls_cert_setup(config_root):
+                setup_nsfs_tls_cert(config_root, local_tls_crt_path=shared_tls_crt_path)
+
+    return _setup_nsfs_server_tls_cert
 
 
 @pytest.fixture(scope="class")
-def s3_client_factory_class(set_nsfs_server_config_root, account_manager_class):
+def s3_client_factory_class(
+    set_nsfs_server_config_root, setup_nsfs_server_tls_cert, account_manager_class
+):
     """
     Class scoped factory to create S3Client instances with given credentials.
 
     Args:
-        set_nsfs_server_config_root (fixture): The prerequisite fixture to setup the NSFS server TLS certificate.
+        set_nsfs_server_config_root (fixture): The prerequisite fixture to setup the NSFS server config root.
+        setup_nsfs_server_tls_cert (fixture): The prerequisite fixture to setup the NSFS server TLS certificate.
         account_manager (AccountManager): The account manager instance.
 
     Returns:
@@ -119,17 +291,20 @@ def s3_client_factory_class(set_nsfs_server_config_root, account_manager_class):
 
     """
     return s3_client_factory_implementation(
-        set_nsfs_server_config_root, account_manager_class
+        set_nsfs_server_config_root, setup_nsfs_server_tls_cert, account_manager_class
     )
 
 
 @pytest.fixture(scope="function")
-def s3_client_factory(set_nsfs_server_config_root, account_manager):
+def s3_client_factory(
+    set_nsfs_server_config_root, setup_nsfs_server_tls_cert, account_manager
+):
     """
     Function scoped factory to create S3Client instances with given credentials.
 
     Args:
-        set_nsfs_server_config_root (fixture): The prerequisite fixture to setup the NSFS server TLS certificate.
+        set_nsfs_server_config_root (fixture): The prerequisite fixture to setup the NSFS server config root.
+        setup_nsfs_server_tls_cert (fixture): The prerequisite fixture to setup the NSFS server TLS certificate.
         account_manager (AccountManager): The account manager instance.
 
     Returns:
@@ -137,21 +312,28 @@ def s3_client_factory(set_nsfs_server_config_root, account_manager):
 
     """
     return s3_client_factory_implementation(
-        set_nsfs_server_config_root, account_manager
+        set_nsfs_server_config_root, setup_nsfs_server_tls_cert, account_manager
     )
 
 
-def s3_client_factory_implementation(set_nsfs_server_config_root, account_manager):
+def s3_client_factory_implementation(
+    set_nsfs_server_config_root, setup_nsfs_server_tls_cert, account_manager
+):
     """
     Factory to create S3Client instances with given credentials.
 
     Args:
+        set_nsfs_server_config_root (func): Configures the NSFS server config root.
+        setup_nsfs_server_tls_cert (func): Sets up the NSFS server TLS certificate.
         account_manager (AccountManager): The account manager instance.
 
     Returns:
         func: A function that creates S3Client instances.
 
     """
+    # S3Client instances created with explicit credentials, reused
+    # for the lifetime of the factory to keep their connections warm
+    s3_clients = {}
 
     def create_s3client(
         endpoint_port=constants.DEFAULT_NSFS_PORT,
@@ -175,29 +357,30 @@ def s3_client_factory_implementation(set_nsfs_server_config_root, account_manage
             config_root = get_env_config_root_full_path()
 
         # The following setup requires the full path of the config root
-        if config_root.startswith("~/"):
-            config_root = (
-                f'{get_noobaa_sa_host_home_path()}/{config_root.split("~/")[1]}'
-            )
+        config_root = get_config_root_full_path(config_root)
 
         set_nsfs_server_config_root(config_root)
-
-        if not check_nsfs_tls_cert_setup(config_root):
-            setup_nsfs_tls_cert(config_root)
+        setup_nsfs_server_tls_cert(config_root)
 
         # Set the AWS access and secret keys
         if access_and_secret_keys_tuple is None:
             _, access_key, secret_key = account_manager.create()
         else:
             access_key, secret_key = access_and_secret_keys_tuple
+            client_key = (endpoint_port, access_key, secret_key, verify_tls)
+            if client_key in s3_clients:
+                return s3_clients[client_key]
 
         nb_sa_host_address = config.ENV_DATA["noobaa_sa_host"]
-        return S3Client(
+        s3_client = S3Client(
             endpoint=f"https://{nb_sa_host_address}:{endpoint_port}",
             access_key=access_key,
             secret_key=secret_key,
             verify_tls=verify_tls,
         )
+        if access_and_secret_keys_tuple is not None:
+            s3_clients[client_key] = s3_client
+        return s3_client
 
     return create_s3client
 
@@ -226,16 +409,66 @@ def c_scope_s3client(s3_client_factory_class):
     return s3_client_factory_class()
 
 
+@pytest.fixture(scope="session")
+def tmp_directories_reaper(request):
+    """
+    Session scoped registry of local testing directories roots,
+    which are all removed together at the end of the session.
+
+    Returns:
+        list: The registered roots of local testing directories
+
+    """
+    tmp_testing_dirs_roots = []
+
+    def cleanup():
+        """
+        Cleanup all the registered local testing directories roots.
+
+        """
+        for tmp_testing_dirs_root in tmp_testing_dirs_roots:
+            shutil.rmtree(tmp_testing_dirs_root, ignore_errors=True)
+
+    request.addfinalizer(cleanup)
+    return tmp_testing_dirs_roots
+
+
 @pytest.fixture()
-def tmp_directories_factory(request):
+def tmp_directories_factory(request, tmp_directories_reaper):
     """
-    Factory to create temporary local testing directories, and cleanup after the test.
+    Factory to create temporary local testing directories.
+    The directories are cleaned up at the end of the test when they are
+    kept in RAM, and at the end of the session otherwise.
+
+    """
+    return tmp_directories_factory_implementation(request, tmp_directories_reaper)
+
+
+def tmp_directories_factory_implementation(request, tmp_directories_reaper):
+    """
+    Factory to create temporary local testing directories.
+
+    Args:
+        request (FixtureRequest): The request of the test to create the directories for
+        tmp_directories_reaper (list): The registry of roots to cleanup at the end of the session.
+
+    Returns:
+        func: A function that creates temporary local testing directories.
 
     """
     random_hex = generate_random_hex(5)
     current_test_name = get_current_test_name()
-    tmp_testing_dirs_root = f"/tmp/{current_test_name}-{random_hex}"
-    os.mkdir(tmp_testing_dirs_root)
+    local_tmp_dir = get_local_tmp_dir()
+    tmp_testing_dirs_root = os.path.join(
+        local_tmp_dir, f"{current_test_name}-{random_hex}"
+    )
+    if local_tmp_dir == constants.LOCAL_RAMDISK_DIR:
+        # Don't keep the testing files in RAM after the test
+        request.addfinalizer(
+            lambda: shutil.rmtree(tmp_testing_dirs_root, ignore_errors=True)
+        )
+    else:
+        tmp_directories_reaper.append(tmp_testing_dirs_root)
 
     def create_tmp_testing_dirs(dirs_to_create):
         """
@@ -245,20 +478,41 @@ def tmp_directories_factory(request):
             dirs_to_create (list): List of directories to create.
 
         """
-        created_dirs_paths = []
-        for dir in dirs_to_create:
-            new_tmp_dir_path = f"{tmp_testing_dirs_root}/{dir}"
-            os.mkdir(new_tmp_dir_path)
-            created_dirs_paths.append(new_tmp_dir_path)
+        created_dirs_paths = [
+            os.path.join(tmp_testing_dirs_root, dir) for dir in dirs_to_create
+        ]
+        for new_tmp_dir_path in created_dirs_paths:
+            # Also creates the testing dirs root on the first call
+            os.makedirs(new_tmp_dir_path, exist_ok=True)
 
         return created_dirs_paths
 
-    def cleanup():
-        """
-        Cleanup local test directories.
+    return create_tmp_testing_dirs
 
-        """
-        exec_cmd(f"rm -rf {tmp_testing_dirs_root}")
 
-    request.addfinalizer(cleanup)
-    return create_tmp_testing_dirs
+@pytest.fixture(scope="session")
+def multipart_origin_files(tmp_path_factory):
+    """
+    Random files large enough for multipart uploads, generated once
+    and shared by all the tests of the session
+
+    Returns:
+        tuple: The origin directory and the list of the files names
+
+    """
+    origin_dir = str(tmp_path_factory.mktemp("multipart_origin"))
+    return generate_multipart_origin_files(origin_dir)
+
+
+@pytest.fixture(scope="session")
+def multipart_origin_md5sums(multipart_origin_files):
+    """
+    The md5sums of the multipart origin files, computed once per session
+    to verify downloaded objects against
+
+    Returns:
+        dict: The hex md5sum of each origin file, by file name
+
+    """
+    origin_dir, _ = multipart_origin_files
+    return get_dir_md5sums(origin_dir)
@@ -16,6 +16,19 @@ def test_account_operations(account_manager):
     secret_key = generate_random_key(constants.EXPECTED_SECRET_KEY_LEN)
     config_root = config.ENV_DATA["config_root"]
     account_manager.create(account_name, access_key, secret_key)
-    account_manager.list(config_root)
+    assert account_name in account_manager.list(config_root), "Account was not listed"
     account_manager.delete(account_name, config_root)
-    account_manager.list()
+    assert account_name not in account_manager.list(
+        config_root
+    ), "Account was still listed after deletion"
+
+
+def test_account_regenerate_keys(template_account, fresh_account):
+    # regenerate the keys of an existing account
+    account_name, access_key, secret_key = template_account
+    fresh_account_name, fresh_access_key, fresh_secret_key = fresh_account
+    assert fresh_account_name == account_name
+    assert len(fresh_access_key) == constants.EXPECTED_ACCESS_KEY_LEN
+    assert len(fresh_secret_key) == constants.EXPECTED_SECRET_KEY_LEN
+    assert fresh_access_key != access_key, "Access key was not regenerated"
+    assert fresh_secret_key != secret_key, "Secret key was not regenerated"
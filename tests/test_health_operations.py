@@ -2,25 +2,59 @@ import json
 import logging
 import pytest
 
+from common_ci_utils.random_utils import generate_unique_resource_name
+
+from noobaa_sa import constants
+from utility.utils import generate_random_key
 from utils.utils import get_noobaa_health_status
 import noobaa_sa.exceptions as e
 
 log = logging.getLogger(__name__)
 
 
+def get_health_status(flag):
+    """
+    Get the parsed health status for the given flag
+
+    Args:
+        flag (dict): The health CLI flags
+
+    Returns:
+        dict: The parsed health status
+
+    Raises:
+        HealthStatusFailed: In case the health status reports an error
+
+    """
+    get_info = json.loads(get_noobaa_health_status(**flag))
+    if "error" in get_info:
+        raise e.HealthStatusFailed(
+            f"Health check failed for {flag} with error {get_info['error']['error_code']}"
+        )
+    return get_info
+
+
+@pytest.mark.xdist_group(name="health_ops")
 class Test_health_operations:
-    @pytest.fixture
-    def setup_prereqs(self, unique_resource_name, random_hex, account_manager, bucket_manager):
+    @pytest.fixture(scope="class")
+    def setup_prereqs(self, request, account_manager_class, bucket_manager_class):
         """
-            Create account and bucket for performing health operation
+            Create account and bucket for performing health operation,
+            shared by all the tests of the class
         """
-        account_name = unique_resource_name(prefix="account")
-        access_key = random_hex()
-        secret_key = random_hex()
-        account_manager.create(account_name, access_key, secret_key)
-        account_manager.list()
-        bucket_name = unique_resource_name(prefix="bucket")
-        bucket_manager.create(account_name, bucket_name)
+        account_name = generate_unique_resource_name(prefix="account")
+        access_key = generate_random_key(constants.EXPECTED_ACCESS_KEY_LEN)
+        secret_key = generate_random_key(constants.EXPECTED_SECRET_KEY_LEN)
+        account_manager_class.create(account_name, access_key, secret_key)
+        bucket_name = generate_unique_resource_name(prefix="bucket")
+        bucket_manager_class.create(account_name, bucket_name)
+
+        def prereqs_cleanup():
+            bucket_manager_class.delete(bucket_name, force=True)
+            account_manager_class.delete(account_name)
+
+        request.addfinalizer(prereqs_cleanup)
+        return account_name, bucket_name
 
     # Noobaa port health operation
     @pytest.mark.parametrize(
@@ -49,11 +83,7 @@ class Test_health_operations:
         # Perform health operation on noobaa
         log.info("Performing Port operations on node health CLI")
         setup_prereqs
-        get_info = json.loads(get_noobaa_health_status(**flag))
-        if "error" in get_info.keys():
-            raise e.HealthStatusFailed(
-                    f"Health check failed for get port with error {get_info['error']['error_code']}"
-                )
+        get_info = get_health_status(flag)
         log.info(get_info)
 
     # Noobaa account health operation
@@ -89,18 +119,16 @@ class Test_health_operations:
         # Perform health operation on noobaa
         log.info("Performing account operations on node health CLI")
         setup_prereqs
-        get_info = json.loads(get_noobaa_health_status(**flag))
-        if "error" in get_info.keys():
+        get_info = get_health_status(flag)
+        details_flag = flag.get('all_account_details')
+        valid_accounts = get_info['checks']['valid_accounts']
+        if details_flag is True and not valid_accounts:
             raise e.HealthStatusFailed(
-                    f"Health check failed for get all account with error {get_info['error']['error_code']}"
+                    f"Health command failed to get all account info with flag --all_account_details {details_flag}"
                 )
-        if flag.get('all_account_details') is True and len(get_info['checks']['valid_accounts']) == 0:
+        if details_flag in (False, None) and valid_accounts:
             raise e.HealthStatusFailed(
-                    f"Health command failed to get all account info with flag --all_account_details {flag.get('all_account_details')}"
-                )
-        if (flag.get('all_account_details') is False or flag.get('all_account_details') is None) and len(get_info['checks']['valid_accounts']) != 0:
-            raise e.HealthStatusFailed(
-                    f"Health command failed to get all account info with flag --all_account_details {flag.get('all_account_details')}"
+                    f"Health command failed to get all account info with flag --all_account_details {details_flag}"
                 )
         log.info(get_info)
 
@@ -137,17 +165,15 @@ class Test_health_operations:
         # Perform health operation on noobaa
         log.info("Performing bucket operations on node health CLI")
         setup_prereqs
-        get_info = json.loads(get_noobaa_health_status(**flag))
-        if "error" in get_info.keys():
-            raise e.HealthStatusFailed(
-                    f"Health check failed for get all account with error {get_info['error']['error_code']}"
-                )
-        if flag.get('all_bucket_details') is True and len(get_info['checks']['valid_buckets']) == 0:
+        get_info = get_health_status(flag)
+        details_flag = flag.get('all_bucket_details')
+        valid_buckets = get_info['checks']['valid_buckets']
+        if details_flag is True and not valid_buckets:
             raise e.HealthStatusFailed(
-                    f"Health command failed to get all account info with flag --all_bucket_details {flag.get('all_bucket_details')}"
+                    f"Health command failed to get all account info with flag --all_bucket_details {details_flag}"
                 )
-        if (flag.get('all_bucket_details') is False or flag.get('all_bucket_details') is None) and len(get_info['checks']['valid_buckets']) != 0:
+        if details_flag in (False, None) and valid_buckets:
             raise e.HealthStatusFailed(
-                    f"Health command failed to get all account info with flag --all_account_details {flag.get('all_bucket_details')}"
+                    f"Health command failed to get all account info with flag --all_account_details {details_flag}"
                 )
         log.info(get_info)
@@ -1,20 +1,159 @@
 import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 
-from utility.bucket_utils import upload_incomplete_multipart_object
-from utility.utils import check_data_integrity
+import pytest
+from common_ci_utils.random_utils import generate_unique_resource_name
+
+from noobaa_sa import constants
+from utility.bucket_utils import (
+    abort_all_multipart_uploads,
+    upload_incomplete_multipart_object,
+)
+from utility.utils import (
+    check_object_md5sum,
+    compute_file_multipart_etag,
+    get_file_part_ranges,
+)
 
 log = logging.getLogger(__name__)
 
 
+def create_class_buckets(request, s3client, amount):
+    """
+    Concurrently create buckets which are deleted with their objects on
+    teardown, after aborting the multipart uploads left incomplete in them
+
+    Args:
+        request (FixtureRequest): The request of the fixture to create the buckets for
+        s3client (S3Client): The S3 client to create the buckets with
+        amount (int): The number of buckets to create
+
+    Returns:
+        list: The names of the created buckets
+
+    """
+    bucket_names = s3client.create_buckets(amount)
+
+    def buckets_cleanup():
+        for bucket_name in bucket_names:
+            abort_all_multipart_uploads(s3client, bucket_name)
+            s3client.delete_bucket(bucket_name, empty_before_deletion=True)
+
+    request.addfinalizer(buckets_cleanup)
+    return bucket_names
+
+
+@pytest.mark.xdist_group(name="multipart")
 class TestMultipartOperations:
     """
     Test S3 object multipart operations on NSFS
     """
 
+    @pytest.fixture(scope="class")
+    def multipart_buckets(self, request, c_scope_s3client):
+        """
+        Buckets shared by all the tests of the class, created together
+
+        Returns:
+            list: The names of the bucket to upload objects to
+                  and of the bucket to copy objects to
+
+        """
+        return create_class_buckets(request, c_scope_s3client, 2)
+
+    @pytest.fixture(scope="class")
+    def multipart_bucket(self, multipart_buckets):
+        """
+        Bucket shared by all the tests of the class to upload objects to
+
+        Returns:
+            str: The name of the bucket
+
+        """
+        return multipart_buckets[0]
+
+    @pytest.fixture(scope="class")
+    def multipart_copy_bucket(self, multipart_buckets):
+        """
+        Bucket shared by all the tests of the class to copy objects to
+
+        Returns:
+            str: The name of the bucket
+
+        """
+        return multipart_buckets[1]
+
+    @pytest.fixture(scope="class")
+    def completed_multipart_upload(
+        self, c_scope_s3client, multipart_origin_files, multipart_bucket
+    ):
+        """
+        Multipart object uploaded and completed once, for the tests of the class
+        which only read the completed object
+
+        Returns:
+            MultipartUploadResult: The info of the upload
+
+        """
+        log.info("Uploading multipart object")
+        resp = upload_incomplete_multipart_object(
+            c_scope_s3client,
+            origin_files=multipart_origin_files,
+            bucket_name=multipart_bucket,
+            key_prefix=generate_unique_resource_name(prefix="mp-completed"),
+        )
+        obj_name = resp.object_names[0]
+        log.info("Completing multipart operation for the object")
+        mp_response = c_scope_s3client.complete_multipart_object_upload(
+            resp.bucket_name,
+            obj_name,
+            resp.upload_ids[obj_name],
+            resp.all_part_info,
+        )
+        log.debug("mp_response=%s", mp_response)
+        log.info("Multipart operation is completed")
+        return resp
+
+    @pytest.fixture(scope="class")
+    def incomplete_multipart_upload(
+        self, request, c_scope_s3client, multipart_origin_files, multipart_bucket
+    ):
+        """
+        Multipart object uploaded once and left incomplete, for the tests of
+        the class which only inspect the ongoing upload. The upload is aborted
+        on teardown.
+
+        Returns:
+            MultipartUploadResult: The info of the upload
+
+        """
+        log.info("Uploading multipart object")
+        resp = upload_incomplete_multipart_object(
+            c_scope_s3client,
+            origin_files=multipart_origin_files,
+            bucket_name=multipart_bucket,
+            key_prefix=generate_unique_resource_name(prefix="mp-incomplete"),
+        )
+
+        def abort_upload():
+            for obj_name in resp.object_names:
+                log.info(f"Aborting the multipart upload of {obj_name}")
+                c_scope_s3client.abort_multipart_upload(
+                    resp.bucket_name, obj_name, resp.upload_ids[obj_name]
+                )
+
+        request.addfinalizer(abort_upload)
+        return resp
+
+    @pytest.mark.parametrize("part_size", ["8M", "16M"])
     def test_multipart_upload(
         self,
         c_scope_s3client,
-        tmp_directories_factory,
+        multipart_origin_files,
+        multipart_bucket,
+        part_size,
     ):
         """
         Test basic s3 operations using a noobaa bucket:
@@ -22,185 +161,215 @@ class TestMultipartOperations:
         2. Create a bucket using S3
         3. Write multipart objects to the bucket
         4. List multipart objects from the bucket
+        5. Verify the multipart object ETag matches the uploaded data
 
         """
         log.info("Uploading multipart object")
-        resp = upload_incomplete_multipart_object(c_scope_s3client, tmp_directories_factory)
-        obj_name = resp["object_names"][0]
+        resp = upload_incomplete_multipart_object(
+            c_scope_s3client,
+            origin_files=multipart_origin_files,
+            bucket_name=multipart_bucket,
+            key_prefix=generate_unique_resource_name(prefix="mp-upload"),
+            part_size=part_size,
+        )
+        obj_name = resp.object_names[0]
         log.info("Trying to complete multipart operation for the object")
         mp_response = c_scope_s3client.complete_multipart_object_upload(
-            resp["bucket_name"],
+            resp.bucket_name,
             obj_name,
-            resp[f"{obj_name}_upload_id"],
-            resp["all_part_info"],
+            resp.upload_ids[obj_name],
+            resp.all_part_info,
         )
         assert (
             mp_response["ResponseMetadata"]["HTTPStatusCode"] == 200
         ), "Failed to upload multipart object"
-        log.info(mp_response)
+        log.debug("mp_response=%s", mp_response)
+        # Verify the uploaded data without downloading it back, when NSFS
+        # calculates md5 based ETags
+        etag = mp_response["ETag"].strip('"')
+        if re.match(constants.MD5_MULTIPART_ETAG_REGEX, etag):
+            expected_etag = resp.expected_etags[obj_name]
+            assert (
+                etag == expected_etag
+            ), f"Multipart object ETag {etag} does not match {expected_etag}"
+        else:
+            log.info(f"ETag {etag} of {obj_name} isn't md5 based, skipping it")
 
-    def test_multipart_download(self, c_scope_s3client, tmp_directories_factory):
+    def test_multipart_download(
+        self,
+        c_scope_s3client,
+        multipart_origin_files,
+        multipart_origin_md5sums,
+        multipart_bucket,
+    ):
         """
         Test basic s3 operations using a noobaa bucket:
-        1. Write multipart objects to the bucket
-        2. Download the objects from the bucket and verify data integrity
+        1. Write multipart objects to the bucket via the boto3 transfer manager
+        2. Verify the objects ETags match the uploaded data when NSFS
+           calculates md5 based ETags
+        3. Download the objects from the bucket and verify data integrity
 
         """
+        origin_dir, origin_names = multipart_origin_files
+        key_prefix = generate_unique_resource_name(prefix="mp-download")
+        origin_file_names = {
+            f"{key_prefix}-{origin_name}": origin_name for origin_name in origin_names
+        }
         log.info("Uploading multipart object")
-        resp = upload_incomplete_multipart_object(c_scope_s3client, tmp_directories_factory)
-        obj_name = resp["object_names"][0]
-        log.info("Completing multipart operation for the object")
-        mp_response = c_scope_s3client.complete_multipart_object_upload(
-            resp["bucket_name"],
-            obj_name,
-            resp[f"{obj_name}_upload_id"],
-            resp["all_part_info"],
-        )
-        log.info(mp_response)
-        log.info("Trying to download multipart object and validating it")
-        c_scope_s3client.download_bucket_contents(
-            resp["bucket_name"], resp["results_dir"]
-        )
-        assert check_data_integrity(resp["origin_dir"], resp["results_dir"])
+        for obj_name, origin_name in origin_file_names.items():
+            c_scope_s3client.upload_file(
+                os.path.join(origin_dir, origin_name),
+                multipart_bucket,
+                obj_name,
+                part_size=constants.DEFAULT_MULTIPART_PART_SIZE,
+            )
+        for obj_name, origin_name in origin_file_names.items():
+            etag = c_scope_s3client.head_object(multipart_bucket, obj_name)[
+                "ETag"
+            ].strip('"')
+            if re.match(constants.MD5_MULTIPART_ETAG_REGEX, etag):
+                expected_etag = compute_file_multipart_etag(
+                    os.path.join(origin_dir, origin_name),
+                    constants.DEFAULT_MULTIPART_PART_SIZE,
+                )
+                assert (
+                    etag == expected_etag
+                ), f"Multipart object ETag {etag} does not match {expected_etag}"
+            else:
+                log.info(f"ETag {etag} of {obj_name} isn't md5 based, skipping it")
+            log.info(f"Trying to download {obj_name} and validating it")
+            assert check_object_md5sum(
+                c_scope_s3client,
+                multipart_bucket,
+                obj_name,
+                multipart_origin_md5sums[origin_name],
+            )
         log.info("Both uploaded and downloaded data are identical")
 
-    def test_list_multipart_objects(self, c_scope_s3client, tmp_directories_factory):
+    def test_list_multipart_objects(self, c_scope_s3client, completed_multipart_upload):
         """
         Test multipart object list operations using BOTO s3:
         1. Write multipart objects to the bucket
         2. List objects from the bucket and verify it
 
         """
-        log.info("Uploading multipart object")
-        resp = upload_incomplete_multipart_object(c_scope_s3client, tmp_directories_factory)
-        obj_name = resp["object_names"][0]
-        log.info("Completing multipart operation for the object")
-        mp_response = c_scope_s3client.complete_multipart_object_upload(
-            resp["bucket_name"],
-            obj_name,
-            resp[f"{obj_name}_upload_id"],
-            resp["all_part_info"],
-        )
-        log.info(mp_response)
-        log.info("Multipart operation is completed")
-        log.info(f"Listing objects present in {resp['bucket_name']}")
-        listed_objs = c_scope_s3client.list_objects(resp["bucket_name"])
-        log.info(listed_objs)
-        assert set(resp["object_names"]).issubset(
-            set(listed_objs)
+        resp = completed_multipart_upload
+        log.info(f"Listing objects present in {resp.bucket_name}")
+        listed_objs = c_scope_s3client.list_objects(resp.bucket_name)
+        log.debug("listed_objs=%s", listed_objs)
+        assert all(
+            obj_name in listed_objs for obj_name in resp.object_names
         ), "All uploaded objects are not present in bucket"
         log.info("Uploaded objects are present in bucket")
 
-    def test_multipart_list_parts(self, c_scope_s3client, tmp_directories_factory):
+    def test_multipart_list_parts(self, c_scope_s3client, incomplete_multipart_upload):
         """
         Test multipart object list operations using BOTO s3:
         1. Write multipart objects to the bucket
         2. List parts objects from the bucket
 
         """
-        log.info("Uploading multipart object")
-        resp = upload_incomplete_multipart_object(c_scope_s3client, tmp_directories_factory)
-        obj_name = resp["object_names"][0]
+        resp = incomplete_multipart_upload
+        obj_name = resp.object_names[0]
         log.info(f"Listing incomplete multipart uploads for the object {obj_name}")
         part_resp = c_scope_s3client.list_uploaded_parts(
-            resp["bucket_name"], obj_name, resp[f"{obj_name}_upload_id"]
+            resp.bucket_name, obj_name, resp.upload_ids[obj_name]
         )
         assert (
             len(part_resp["Parts"]) != 0
-        ), f"Failed to list parts of {resp['object_names'][0]} object"
-        log.info(part_resp)
+        ), f"Failed to list parts of {resp.object_names[0]} object"
+        log.debug("part_resp=%s", part_resp)
         log.info(f"Listing incomplete parts for {obj_name} completed successfully")
-        log.info("Completing multipart operation for the object")
-        mp_response = c_scope_s3client.complete_multipart_object_upload(
-            resp["bucket_name"],
-            obj_name,
-            resp[f"{obj_name}_upload_id"],
-            resp["all_part_info"],
-        )
-        log.info(mp_response)
-        log.info("Multipart operation is completed")
 
-    def test_list_multipart_uploads(self, c_scope_s3client, tmp_directories_factory):
+    def test_list_multipart_uploads(
+        self, c_scope_s3client, incomplete_multipart_upload
+    ):
         """
         Test multipart object list operations using BOTO s3:
         1. Write multipart objects to the bucket
         2. List all incomplete parts from the bucket
 
         """
-        log.info("Uploading multipart object")
-        resp = upload_incomplete_multipart_object(c_scope_s3client, tmp_directories_factory)
-        obj_name = resp["object_names"][0]
+        resp = incomplete_multipart_upload
         log.info(
-            f"Listing incomplete multipart uploads for the bucket {resp['bucket_name']}"
+            f"Listing incomplete multipart uploads for the bucket {resp.bucket_name}"
         )
-        part_resp = c_scope_s3client.list_multipart_upload(resp["bucket_name"])
+        part_resp = c_scope_s3client.list_multipart_upload(resp.bucket_name)
         assert (
             len(part_resp["Uploads"]) != 0
-        ), f"Failed to list parts present in {resp['bucket_name']} object"
-        log.info(part_resp)
+        ), f"Failed to list parts present in {resp.bucket_name} object"
+        log.debug("part_resp=%s", part_resp)
         log.info(
             "Listing incomplete multipart uploads operation completed successfully"
         )
-        log.info("Completing multipart operation for the object")
-        mp_response = c_scope_s3client.complete_multipart_object_upload(
-            resp["bucket_name"],
-            obj_name,
-            resp[f"{obj_name}_upload_id"],
-            resp["all_part_info"],
-        )
-        log.info(mp_response)
-        log.info("Multipart operation is completed")
 
     def test_multipart_upload_part_copy(
-        self, c_scope_s3client, tmp_directories_factory
+        self, c_scope_s3client, completed_multipart_upload, multipart_copy_bucket
     ):
         """
         Test multipart object list operations using BOTO s3:
         1. Write multipart objects to the bucket
-        2. Create new bucket
-        3. Copy object data from bucket created in step 1 to new bucket
+        2. Use a second bucket of the class
+        3. Copy object data from bucket created in step 1 to new bucket,
+           in byte ranges copied concurrently
 
         """
-        log.info("Uploading multipart object")
-        resp = upload_incomplete_multipart_object(c_scope_s3client, tmp_directories_factory)
-        obj_name = resp["object_names"][0]
-        c_scope_s3client.complete_multipart_object_upload(
-            resp["bucket_name"],
-            obj_name,
-            resp[f"{obj_name}_upload_id"],
-            resp["all_part_info"],
-        )
-        log.info("Creating another bucket to copy data")
-        new_bucket = c_scope_s3client.create_bucket()
+        resp = completed_multipart_upload
+        obj_name = resp.object_names[0]
+        new_bucket = multipart_copy_bucket
         log.info("Generating upload id for the multipart object")
         get_upload_id = c_scope_s3client.initiate_multipart_object_upload(
             new_bucket,
             obj_name,
         )
         log.info("Copying data using upload_part_copy method")
-        upload_part_copy = c_scope_s3client.multipart_upload_part_copy(
-            new_bucket,
-            obj_name,
-            resp["bucket_name"] + "/" + obj_name,
-            1,
-            get_upload_id,
+        part_ranges = get_file_part_ranges(
+            os.path.join(resp.origin_dir, resp.origin_file_names[obj_name]),
+            resp.part_size,
         )
-        assert (
-            upload_part_copy["ResponseMetadata"]["HTTPStatusCode"] == 200
-        ), f"Failed to copy data from {resp['bucket_name']} to {new_bucket}"
-        log.info(upload_part_copy)
+        copy_source = f"{resp.bucket_name}/{obj_name}"
+
+        def copy_part(part_id):
+            offset, length = part_ranges[part_id - 1]
+            upload_part_copy = c_scope_s3client.multipart_upload_part_copy(
+                new_bucket,
+                obj_name,
+                copy_source,
+                part_id,
+                get_upload_id,
+                copy_source_range=f"bytes={offset}-{offset + length - 1}",
+            )
+            assert (
+                upload_part_copy["ResponseMetadata"]["HTTPStatusCode"] == 200
+            ), f"Failed to copy data from {resp.bucket_name} to {new_bucket}"
+            log.debug("upload_part_copy=%s", upload_part_copy)
+            return {
+                "PartNumber": part_id,
+                "ETag": upload_part_copy["CopyPartResult"]["ETag"],
+            }
+
+        # Copy the byte ranges of the source object concurrently
+        # An empty file has no parts, but the pool still needs a worker
+        max_workers = max(
+            1, min(constants.MULTIPART_UPLOAD_MAX_WORKERS, len(part_ranges))
+        )
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            all_part_info = list(
+                executor.map(copy_part, range(1, len(part_ranges) + 1))
+            )
         log.info("Data copied successfully from source bucket to new bucket")
         log.info("Completing multipart operation for new object")
-        all_part_info = []
-        all_part_info.append(
-            {"PartNumber": 1, "ETag": upload_part_copy["CopyPartResult"]["ETag"]}
-        )
         c_scope_s3client.complete_multipart_object_upload(
             new_bucket, obj_name, get_upload_id, all_part_info
         )
         log.info("Multipart operation is completed using upload_part_copy method")
 
-    def test_s3_multipart_abort_upload(self, c_scope_s3client, tmp_directories_factory):
+    def test_s3_multipart_abort_upload(
+        self,
+        c_scope_s3client,
+        multipart_origin_files,
+        multipart_bucket,
+    ):
         """
         Test multipart object list operations using BOTO s3:
         1. Write multipart objects to the bucket
@@ -208,15 +377,19 @@ class TestMultipartOperations:
 
         """
         log.info("Uploading multipart object")
-        resp = upload_incomplete_multipart_object(c_scope_s3client, tmp_directories_factory)
+        resp = upload_incomplete_multipart_object(
+            c_scope_s3client,
+            origin_files=multipart_origin_files,
+            bucket_name=multipart_bucket,
+            key_prefix=generate_unique_resource_name(prefix="mp-abort"),
+        )
         log.info("Aborting Multipart operation")
-        obj_name = resp["object_names"][0]
+        obj_name = resp.object_names[0]
         abort_resp = c_scope_s3client.abort_multipart_upload(
-            resp["bucket_name"], obj_name, resp[f"{obj_name}" + "_upload_id"]
+            resp.bucket_name, obj_name, resp.upload_ids[obj_name]
         )
-        log.info(abort_resp)
+        log.debug("abort_resp=%s", abort_resp)
         assert (
             abort_resp["ResponseMetadata"]["HTTPStatusCode"] == 204
         ), f"Failed to abort upload operation for {obj_name}"
-        log.info(abort_resp)
         log.info("Multipart operation Aborted successfully")
@@ -4,13 +4,14 @@ import tempfile
 from datetime import datetime, timedelta, timezone
 
 import pytest
-from common_ci_utils.file_system_utils import compare_md5sums
 from common_ci_utils.random_utils import (
     generate_random_files,
     generate_random_hex,
     generate_unique_resource_name,
 )
 
+from utility.utils import check_data_integrity
+
 log = logging.getLogger(__name__)
 
 
@@ -180,8 +181,7 @@ class TestS3ObjectOperations:
         5. Verify the copied object content matches the original
 
         """
-        bucket_a = c_scope_s3client.create_bucket()
-        bucket_b = c_scope_s3client.create_bucket()
+        bucket_a, bucket_b = c_scope_s3client.create_buckets(2)
 
         # 1. Put an object to a bucket
         obj_name = generate_unique_resource_name(prefix="obj")
@@ -234,30 +234,17 @@ class TestS3ObjectOperations:
         bucket = c_scope_s3client.create_bucket()
 
         # 1. Put random objects to a bucket
-        original_objs_names = c_scope_s3client.put_random_objects(
+        c_scope_s3client.put_random_objects(
             bucket, amount=10, min_size="1M", max_size="2M", files_dir=origin_dir
         )
 
         # 2. Download the bucket contents
         c_scope_s3client.download_bucket_contents(bucket, results_dir)
-        downloaded_objs_names = os.listdir(results_dir)
 
         # 3. Compare the MD5 sums of the original and downloaded objects
-        # Verify that the number of original and downloaded objects match
-        assert len(original_objs_names) == len(
-            downloaded_objs_names
-        ), "Downloaded and original objects count does not match"
-
-        # Sort the two lists to align for the comparison via zip
-        original_objs_names.sort()
-        downloaded_objs_names.sort()
-
-        # Compare the MD5 sums of each origina object against its downloaded counterpart
-        for original, downloaded in zip(original_objs_names, downloaded_objs_names):
-            original_full_path = os.path.join(origin_dir, original)
-            downloaded_full_path = os.path.join(results_dir, downloaded)
-            md5sums_match = compare_md5sums(original_full_path, downloaded_full_path)
-            assert md5sums_match, f"MD5 sums do not match for {original}"
+        assert check_data_integrity(
+            origin_dir, results_dir
+        ), "MD5 sums of the original and downloaded objects do not match"
 
     def test_expected_put_and_get_failures(self, c_scope_s3client):
         """
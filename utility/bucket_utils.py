@@ -2,73 +2,236 @@
 Bucket utility functions
 """
 
+import hashlib
 import logging
+import mmap
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+
 from common_ci_utils.random_utils import (
     generate_random_files,
+    parse_size_to_bytes,
 )
+from s3transfer.utils import ReadFileChunk
+
+from noobaa_sa import constants
 from utility.utils import (
-    split_file_data_for_multipart_upload,
+    compute_multipart_etag,
+    get_file_part_ranges,
 )
 
 log = logging.getLogger(__name__)
 
 
+@dataclass
+class MultipartUploadResult:
+    """
+    Info of multipart objects uploaded without completing them
+
+    Attributes:
+        bucket_name (str): The bucket the objects were uploaded to
+        origin_dir (str): The directory of the uploaded files
+        object_names (list): The names of the uploaded objects
+        origin_file_names (dict): The name of the file each object was
+            uploaded from, under origin_dir
+        part_size (str): The size of the uploaded parts, e.g. "16M"
+        upload_ids (dict): The upload ID of each object
+        all_part_info (list): The PartNumber and ETag of each uploaded part,
+            in part order, to complete the upload with
+        expected_etags (dict): The md5 based ETag each object is expected to
+            have once its upload is completed
+
+    """
+
+    bucket_name: str
+    origin_dir: str
+    object_names: list
+    origin_file_names: dict
+    part_size: str
+    upload_ids: dict = field(default_factory=dict)
+    all_part_info: list = field(default_factory=list)
+    expected_etags: dict = field(default_factory=dict)
+
+
+def generate_multipart_origin_files(origin_dir, amount=1):
+    """
+    Generate random files large enough to be uploaded as multipart objects
+
+    Args:
+        origin_dir (str): Location to write the files to
+        amount (int): Number of files to generate
+
+    Returns:
+        tuple: The origin directory and the list of the generated files names
+
+    """
+    object_names = generate_random_files(
+        origin_dir,
+        amount,
+        min_size="20M",
+        max_size="30M",
+    )
+    return origin_dir, object_names
+
+
 def upload_incomplete_multipart_object(
     c_scope_s3client,
-    tmp_directories_factory,
     amount=1,
+    origin_files=None,
+    bucket_name=None,
+    part_size=constants.DEFAULT_MULTIPART_PART_SIZE,
+    key_prefix=None,
+    tmp_directories_factory=None,
 ):
     """
     Uploads multipart object without actual completing it
     Args:
         c_scope_s3client(Obj): S3 client
-        tmp_directories_factory(List): Location of data which needs to be
-            uploaded
         amount(int): Object count to be written
-    Rerturn:
-        Dict: Containing the necessary info
+        origin_files(tuple): Origin directory and files names, as returned by
+            generate_multipart_origin_files, to upload instead of generating
+            new random files
+        bucket_name(str): Bucket to upload the objects to. If not specified,
+            a new bucket is created
+        part_size(str): Size of the parts to upload, e.g. "16M". Must be at
+            least 5M, as S3 rejects the completion of uploads with smaller
+            parts other than the last
+        key_prefix(str): Prefix to name the objects with, followed by the
+            origin file name, so objects uploaded from the same origin files
+            to a shared bucket don't overwrite each other
+        tmp_directories_factory(func): Factory to create the directory to
+            generate new random files in. Required only when origin_files
+            are not given
+    Returns:
+        MultipartUploadResult: The info of the upload, including the expected
+            md5 based ETag of each object once its upload is completed
+
+    Raises:
+        ValueError: If part_size is smaller than the S3 minimum part size
 
     """
-    resp_dir = {}
-    origin_dir, results_dir = tmp_directories_factory(
-        dirs_to_create=["origin", "result"]
-    )
-    resp_dir["origin_dir"] = origin_dir
-    resp_dir["results_dir"] = results_dir
+    if parse_size_to_bytes(part_size) < parse_size_to_bytes(
+        constants.MULTIPART_MIN_PART_SIZE
+    ):
+        raise ValueError(
+            f"Multipart part size {part_size} is smaller than the S3 minimum "
+            f"of {constants.MULTIPART_MIN_PART_SIZE}"
+        )
     # 1. Create a bucket using S3
-    bucket_name = c_scope_s3client.create_bucket()
-    resp_dir["bucket_name"] = bucket_name
+    if bucket_name is None:
+        bucket_name = c_scope_s3client.create_bucket()
     # 2. Write multipart objects to the bucket
-    object_names = generate_random_files(
-        origin_dir,
-        amount,
-        min_size="20M",
-        max_size="30M",
+    if origin_files is None:
+        origin_dir = tmp_directories_factory(dirs_to_create=["origin"])[0]
+        origin_files = generate_multipart_origin_files(origin_dir, amount)
+    origin_dir, origin_names = origin_files
+    origin_file_names = {
+        (f"{key_prefix}-{origin_name}" if key_prefix else origin_name): origin_name
+        for origin_name in origin_names
+    }
+    result = MultipartUploadResult(
+        bucket_name=bucket_name,
+        origin_dir=origin_dir,
+        object_names=list(origin_file_names),
+        origin_file_names=origin_file_names,
+        part_size=part_size,
     )
-    resp_dir["object_names"] = object_names
     # Upload multipart object
     log.info("Initiate multipart upload process")
-    for i in range(len(object_names)):
+    for object_name, origin_name in origin_file_names.items():
         get_upload_id = c_scope_s3client.initiate_multipart_object_upload(
             bucket_name,
-            object_names[i],
+            object_name,
         )
-        resp_dir[f"{object_names[i]}_upload_id"] = get_upload_id
-        all_part_info = []
-        file_name = origin_dir + "/" + object_names[i]
-        part_size = "10M"
+        result.upload_ids[object_name] = get_upload_id
+        file_name = os.path.join(origin_dir, origin_name)
         log.info(f"Split data into {part_size} size")
-        part_data = split_file_data_for_multipart_upload(file_name, part_size)
+        part_ranges = get_file_part_ranges(file_name, part_size)
         log.info("Initiate part uploads for multipart object")
-        for pd in range(len(part_data)):
-            part_id = pd + 1
-            part_info = c_scope_s3client.initiate_upload_part(
+
+        parts_md5_digests = {}
+
+        def upload_part(part_id):
+            offset, length = part_ranges[part_id - 1]
+            # Hash the part straight from the mapped file for the expected
+            # object ETag, without copying it into a bytes object
+            with file_view[offset : offset + length] as part_view:
+                parts_md5_digests[part_id] = hashlib.md5(part_view).digest()
+            # Stream the part body from the file instead of reading it
+            # into memory
+            with ReadFileChunk.from_filename(file_name, offset, length) as part_body:
+                part_info = c_scope_s3client.initiate_upload_part(
+                    bucket_name,
+                    object_name,
+                    part_id,
+                    get_upload_id,
+                    part_body,
+                )
+            return {"PartNumber": part_id, "ETag": part_info["ETag"]}
+
+        # Upload the parts concurrently and collect them as they complete,
+        # so a failed part is raised right away instead of in part order
+        # An empty file has no parts, but the pool still needs a worker
+        max_workers = max(
+            1, min(constants.MULTIPART_UPLOAD_MAX_WORKERS, len(part_ranges))
+        )
+        uploaded_parts = {}
+        with open(file_name, "rb") as file_obj, ExitStack() as stack:
+            # An empty file can't be mapped, but it has no parts to hash either
+            file_view = memoryview(b"")
+            if part_ranges:
+                file_mmap = stack.enter_context(
+                    mmap.mmap(file_obj.fileno(), 0, access=mmap.ACCESS_READ)
+                )
+                file_view = stack.enter_context(memoryview(file_mmap))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [
+                    executor.submit(upload_part, part_id)
+                    for part_id in range(1, len(part_ranges) + 1)
+                ]
+                try:
+                    for future in as_completed(futures):
+                        part_info = future.result()
+                        uploaded_parts[part_info["PartNumber"]] = part_info
+                except Exception:
+                    # Skip the parts that didn't start uploading yet
+                    for future in futures:
+                        future.cancel()
+                    raise
+        result.all_part_info = [
+            uploaded_parts[part_id] for part_id in sorted(uploaded_parts)
+        ]
+        result.expected_etags[object_name] = compute_multipart_etag(
+            [parts_md5_digests[part_id] for part_id in sorted(parts_md5_digests)]
+        )
+    return result
+
+
+def abort_all_multipart_uploads(s3client, bucket_name):
+    """
+    Concurrently abort all the incomplete multipart uploads in a bucket
+
+    Args:
+        s3client (S3Client): S3 client
+        bucket_name (str): Name of the bucket
+
+    """
+    uploads = s3client.list_multipart_upload(bucket_name).get("Uploads", [])
+    if not uploads:
+        return
+    log.info(f"Aborting {len(uploads)} incomplete multipart uploads in {bucket_name}")
+    max_workers = min(constants.MULTIPART_UPLOAD_MAX_WORKERS, len(uploads))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(
+                s3client.abort_multipart_upload,
                 bucket_name,
-                object_names[i],
-                part_id,
-                get_upload_id,
-                part_data[pd],
+                upload["Key"],
+                upload["UploadId"],
             )
-            all_part_info.append({"PartNumber": part_id, "ETag": part_info["ETag"]})
-        resp_dir["all_part_info"] = all_part_info
-    return resp_dir
+            for upload in uploads
+        ]
+        for future in futures:
+            future.result()
@@ -9,16 +9,20 @@ import os
 import tempfile
 
 from common_ci_utils.file_system_utils import compare_md5sums
-from common_ci_utils.templating import Templating
 
 from framework import config
 from framework.ssh_connection_manager import SSHConnectionManager
 from noobaa_sa import constants
 from noobaa_sa.exceptions import MissingFileOrDirectory
 from noobaa_sa.s3_client import S3Client
+from utility.utils import render_template
 
 log = logging.getLogger(__name__)
 
+# Config roots whose remote TLS certificate was already verified to match
+# the local one during this session
+_verified_tls_cert_config_roots = set()
+
 
 def run_systemctl_command_on_nsfs_service(cmd):
     """
@@ -85,7 +89,8 @@ def create_tls_key_and_cert(credentials_dir):
     Create a TLS key and certificate for the NSFS server
 
     Args:
-        credentials_dir (str): The full path to the credentials directory on the remote machine
+        credentials_dir (str): The full path to the credentials directory on the remote machine.
+            The directory is created if it doesn't exist.
 
     Returns:
         str: The full path to the TLS certificate file that was created
@@ -97,31 +102,26 @@ def create_tls_key_and_cert(credentials_dir):
         f"Generating TLS key and certificate using openssl under {credentials_dir}"
     )
 
-    # Create the TLS key
-    conn.exec_cmd(f"sudo openssl genpkey -algorithm RSA -out {credentials_dir}/tls.key")
-
     # Create a SAN (Subject Alternative Name) configuration file to use with the CSR
     with tempfile.NamedTemporaryFile(mode="w+") as tmp_file:
-        templating = Templating(base_path=config.ENV_DATA["template_dir"])
         account_template = "openssl_san.cnf"
-        account_data_full = templating.render_template(
+        account_data_full = render_template(
             account_template, data={"nsfs_server_ip": conn.host}
         )
         tmp_file.write(account_data_full)
         tmp_file.flush()
         conn.upload_file(tmp_file.name, "/tmp/openssl_san.cnf")
 
-    # Create a CSR (Certificate Signing Cequest) file
+    # Create the credentials directory and the TLS key, a CSR (Certificate
+    # Signing Request) and a self-signed certificate in a single remote call
     conn.exec_cmd(
+        f"sudo mkdir -p {credentials_dir} -m 777 && "
+        f"sudo openssl genpkey -algorithm RSA -out {credentials_dir}/tls.key && "
         "sudo openssl req -new "
         f"-key {credentials_dir}/tls.key "
         f"-out {credentials_dir}/tls.csr "
         "-config /tmp/openssl_san.cnf "
-        "-subj '/CN=localhost' "
-    )
-
-    # Use the TLS key and CSR to create a self-signed certificate
-    conn.exec_cmd(
+        "-subj '/CN=localhost' && "
         "sudo openssl x509 -req -days 365 "
         f"-in {credentials_dir}/tls.csr "
         f"-signkey {credentials_dir}/tls.key "
@@ -160,40 +160,88 @@ def set_nsfs_certs_dir(creds_dir, config_root=config.ENV_DATA["config_root"]):
     conn.exec_cmd(f"echo '{json.dumps(system_json)}' > {config_root}/system.json")
 
 
-def setup_nsfs_tls_cert(config_root):
+def is_nsfs_tls_cert_configured(config_root):
+    """
+    Check whether the NSFS server is already configured to use a TLS key and
+    certificate from the certificates directory under config_root, which
+    are still valid for the current host
+
+    Args:
+        config_root (str): The full path to the configuration root directory on the remote machine
+
+    Returns:
+        bool: True if the TLS key and certificate exist, the certificate hasn't
+              expired and its SAN matches the current host, and system.json
+              points to them. False otherwise.
+
+    """
+    conn = SSHConnectionManager().connection
+    creds_dir = f"{config_root}/certificates"
+    tls_crt_path = f"{creds_dir}/tls.crt"
+    retcode, stdout, _ = conn.exec_cmd(
+        f"sudo [ -e '{creds_dir}/tls.key' ] && sudo [ -e '{tls_crt_path}' ] "
+        f"&& sudo openssl x509 -checkend 0 -noout -in {tls_crt_path} > /dev/null "
+        f"&& sudo openssl x509 -noout -text -in {tls_crt_path} "
+        f"| grep -qwF 'IP Address:{conn.host}' "
+        f"&& sudo cat {config_root}/system.json"
+    )
+    if retcode != 0:
+        return False
+    try:
+        system_json = json.loads(stdout)
+    except ValueError:
+        return False
+    return system_json.get("nsfs_ssl_key_dir") == creds_dir
+
+
+def setup_nsfs_tls_cert(config_root, local_tls_crt_path=None):
     """
     Configure the NSFS server TLS certification and download the certificate
     in a local file.
 
     Args:
         config_root (str): The path to the configuration root directory.
+        local_tls_crt_path (str): The local path to download the certificate to.
+            If not specified, a new temporary file will be used.
 
     """
 
     conn = SSHConnectionManager().connection
     remote_credentials_dir = f"{config_root}/certificates"
-
-    # Create the TLS credentials and configure the NSFS service to use them
-    conn.exec_cmd(f"sudo mkdir -p {remote_credentials_dir} -m 777")
-    remote_tls_crt_path = create_tls_key_and_cert(remote_credentials_dir)
-    set_nsfs_certs_dir(remote_credentials_dir, config_root)
-    restart_nsfs_service()
+    remote_tls_crt_path = f"{remote_credentials_dir}/tls.crt"
+
+    # Only download the certificate if the NSFS service already uses one,
+    # which saves regenerating it and restarting the service
+    if is_nsfs_tls_cert_configured(config_root):
+        log.info(f"Reusing the NSFS server TLS certificate under {config_root}")
+    else:
+        # Create the TLS credentials and configure the NSFS service to use them
+        remote_tls_crt_path = create_tls_key_and_cert(remote_credentials_dir)
+        set_nsfs_certs_dir(remote_credentials_dir, config_root)
+        restart_nsfs_service()
 
     # Download the certificate to a local file
-    with tempfile.NamedTemporaryFile(
-        prefix="tls_", suffix=".crt", delete=False
-    ) as local_tls_crt_file:
-        conn.download_file(
-            remotepath=remote_tls_crt_path,
-            localpath=local_tls_crt_file.name,
-        )
+    if local_tls_crt_path is None:
+        with tempfile.NamedTemporaryFile(
+            prefix="tls_", suffix=".crt", delete=False
+        ) as local_tls_crt_file:
+            local_tls_crt_path = local_tls_crt_file.name
+    conn.download_file(
+        remotepath=remote_tls_crt_path,
+        localpath=local_tls_crt_path,
+    )
+
+    S3Client.static_tls_crt_path = local_tls_crt_path
 
-    S3Client.static_tls_crt_path = local_tls_crt_file.name
+    # The local certificate was replaced, so previous verifications are stale
+    _verified_tls_cert_config_roots.clear()
+    _verified_tls_cert_config_roots.add(config_root)
 
 
 def check_nsfs_tls_cert_setup(config_root):
     """
     Check whether the CI has the NSFS server TLS certificate.
+    A positive result is cached per config root for the rest of the session.
 
     Args:
         config_root (str): The full path of the configuration root directory.
@@ -203,6 +251,9 @@ def check_nsfs_tls_cert_setup(config_root):
               False otherwise.
 
     """
+    if config_root in _verified_tls_cert_config_roots:
+        return True
+
     conn = SSHConnectionManager().connection
 
     # Check if the local TLS certificate file exists
@@ -216,11 +267,11 @@ def check_nsfs_tls_cert_setup(config_root):
         )
         return False
 
-    # Check if a TLS certificate file exists on the remote machine under the config root
-    retcode, _, _ = conn.exec_cmd(f"sudo [ -e '{config_root}/certificates/tls.crt' ]")
-    if retcode != 0:
+    # Check if a valid TLS certificate for the current host is configured
+    # on the remote machine under the config root
+    if not is_nsfs_tls_cert_configured(config_root):
         log.info(
-            f"NSFS server TLS certificate was not found under {config_root}/certificates"
+            f"A valid NSFS server TLS certificate was not found under {config_root}/certificates"
         )
         return False
 
@@ -230,4 +281,8 @@ def check_nsfs_tls_cert_setup(config_root):
             remotepath=f"{config_root}/certificates/tls.crt",
             localpath=f"{tmp_dir}/tls.crt",
         )
-        return compare_md5sums(local_tls_crt_file, S3Client.static_tls_crt_path)
+        if not compare_md5sums(local_tls_crt_file, S3Client.static_tls_crt_path):
+            return False
+
+    _verified_tls_cert_config_roots.add(config_root)
+    return True
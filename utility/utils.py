@@ -2,23 +2,39 @@
 General utility functions
 """
 
+import functools
+import hashlib
 import logging
+import mmap
 import os
 import random
 import string
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
 from framework import config
+from noobaa_sa import constants
 from framework.ssh_connection_manager import SSHConnectionManager
-from common_ci_utils.file_system_utils import compare_md5sums
 from common_ci_utils.random_utils import parse_size_to_bytes
+from jinja2 import Environment, FileSystemLoader
 
 
 log = logging.getLogger(__name__)
 
+# Characters which can be used in access and secret keys
+INVALID_KEY_CHARS = ["\\", "/", " ", '"', "'"]
+VALID_KEY_CHARS = (
+    string.ascii_letters
+    + string.digits
+    + "".join(ch for ch in string.punctuation if ch not in INVALID_KEY_CHARS)
+)
 
+
+@functools.lru_cache(maxsize=None)
 def get_noobaa_sa_host_home_path():
     """
-    Get the full path of the home directory on the remote machine
+    Get the full path of the home directory on the remote machine.
+    The path is fetched once and reused for the rest of the session.
 
     Returns:
         str: The full path of the home directory on the remote machine
@@ -40,18 +56,19 @@ def get_current_test_name():
     return os.environ.get("PYTEST_CURRENT_TEST").split(":")[-1].split(" ")[0]
 
 
-def get_env_config_root_full_path():
+def get_config_root_full_path(config_root):
     """
-    Get the full path of directory that's specified as the config_root
-    in under ENV_DATA in the CI's configuration
+    Get the full path of a config root directory on the remote machine
+
+    Args:
+        config_root (str): The path of the configuration root directory,
+            which may be relative to the home directory ("~/")
 
     Returns:
         str: The full path of the configuration root directory on the remote
         machine
 
     """
-    config_root = config.ENV_DATA["config_root"]
-
     if config_root.startswith("~/") == False:
         return config_root
 
@@ -59,6 +76,40 @@ def get_env_config_root_full_path():
     return f"{get_noobaa_sa_host_home_path()}/{config_root}"
 
 
+@functools.lru_cache(maxsize=None)
+def get_env_config_root_full_path():
+    """
+    Get the full path of directory that's specified as the config_root
+    in under ENV_DATA in the CI's configuration
+
+    Returns:
+        str: The full path of the configuration root directory on the remote
+        machine
+
+    """
+    return get_config_root_full_path(config.ENV_DATA["config_root"])
+
+
+def get_local_tmp_dir():
+    """
+    Get the local directory to create temporary testing directories under.
+    A RAM backed directory is preferred when it currently has enough free
+    space, so the testing files don't hit the disk.
+
+    Returns:
+        str: The full path of the local temporary directory
+
+    """
+    ramdisk_dir = constants.LOCAL_RAMDISK_DIR
+    if os.path.isdir(ramdisk_dir) and os.access(ramdisk_dir, os.W_OK):
+        stats = os.statvfs(ramdisk_dir)
+        if stats.f_bavail * stats.f_frsize >= parse_size_to_bytes(
+            constants.LOCAL_RAMDISK_MIN_FREE_SPACE
+        ):
+            return ramdisk_dir
+    return tempfile.gettempdir()
+
+
 def check_data_integrity(origin_dir, results_dir):
     """
     Ckeck the data integrity of downloaded objects with uploaded objects
@@ -78,43 +129,167 @@ def check_data_integrity(origin_dir, results_dir):
         return False
     uploaded_objs_names.sort()
     downloaded_objs_names.sort()
+    files_pairs = []
     for uploaded, downloaded in zip(uploaded_objs_names, downloaded_objs_names):
         original_full_path = os.path.join(origin_dir, uploaded)
         downloaded_full_path = os.path.join(results_dir, downloaded)
-        if not compare_md5sums(original_full_path, downloaded_full_path):
+        # Files of different sizes can't match, so skip hashing them
+        if os.path.getsize(original_full_path) != os.path.getsize(
+            downloaded_full_path
+        ):
+            log.error(f"Size mismatch for object {uploaded} and {downloaded}")
+            return False
+        files_pairs.append((original_full_path, downloaded_full_path))
+    if not files_pairs:
+        return True
+
+    # Hash all the files concurrently, since hashlib releases the GIL
+    # while hashing large buffers
+    all_paths = [path for files_pair in files_pairs for path in files_pair]
+    max_workers = min(os.cpu_count() or 1, len(all_paths))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        md5sums = dict(zip(all_paths, executor.map(get_file_md5sum, all_paths)))
+    for original_full_path, downloaded_full_path in files_pairs:
+        uploaded = os.path.basename(original_full_path)
+        downloaded = os.path.basename(downloaded_full_path)
+        if md5sums[original_full_path] != md5sums[downloaded_full_path]:
             log.error(f"Mismatch for object {uploaded} and {downloaded}")
             return False
         log.info(f"MD5sums are matched for object {uploaded} and {downloaded}")
     return True
 
 
-def split_file_data_for_multipart_upload(file_name, part_size=None):
+def get_file_md5sum(file_path, chunk_size=1024 * 1024):
     """
-    Split original file into defined or random size
+    Compute the md5sum of a file, reading it in chunks
 
-    args:
+    Args:
+        file_path (str): The full path of the file
+        chunk_size (int): The number of bytes to read at a time
+
+    Returns:
+        str: The hex md5sum of the file
+
+    """
+    md5 = hashlib.md5()
+    with open(file_path, "rb") as file_obj:
+        for chunk in iter(lambda: file_obj.read(chunk_size), b""):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def get_dir_md5sums(dir_path):
+    """
+    Compute the md5sum of each file in a directory
+
+    Args:
+        dir_path (str): The directory location of the files
+
+    Returns:
+        dict: The hex md5sum of each file, by file name
+
+    """
+    return {
+        file_name: get_file_md5sum(os.path.join(dir_path, file_name))
+        for file_name in os.listdir(dir_path)
+    }
+
+
+def check_object_md5sum(
+    s3client, bucket_name, object_key, expected_md5sum, chunk_size=1024 * 1024
+):
+    """
+    Check the data integrity of an object by hashing it as it's streamed
+    from the bucket, without writing it to a local file
+
+    Args:
+        s3client (S3Client): S3 client
+        bucket_name (str): The name of the bucket
+        object_key (str): The key of the object
+        expected_md5sum (str): The hex md5sum the object data should have
+        chunk_size (int): The number of bytes to read from the stream at a time
+    Returns:
+        bool: Boolean value based on comparision
+
+    """
+    response = s3client.get_object(bucket_name, object_key)
+    if "Body" not in response:
+        log.error(f"Failed to get object {object_key}: {response['Code']}")
+        return False
+    md5 = hashlib.md5()
+    for chunk in response["Body"].iter_chunks(chunk_size):
+        md5.update(chunk)
+    if md5.hexdigest() != expected_md5sum:
+        log.error(f"Mismatch for object {object_key}")
+        return False
+    log.info(f"MD5sums are matched for object {object_key}")
+    return True
+
+
+def get_file_part_ranges(file_name, part_size=None):
+    """
+    Get the byte ranges of the parts of a file, without reading its data
+
+    Args:
         file_name (str): Name of the file
         part_size (str): Fixed size of file chunk if part_size is not None
                          Random size of file chunk if part_size is None
 
-    return:
-        list : List of file chunks
+    Returns:
+        list: List of (offset, length) tuples of the file chunks
 
     """
+    file_size = os.path.getsize(file_name)
     if part_size is not None:
         new_part_size = parse_size_to_bytes(part_size)
     else:
-        file_size = os.path.getsize(file_name)
         new_part_size = random.randint(1, file_size)
-    all_chunks = []
-    with open(file_name, "rb") as f:
-        while True:
-            log.info(f"Reading {new_part_size} chunks of the {file_name}")
-            file_chunk = f.read(new_part_size)
-            if file_chunk == b"":
-                break
-            all_chunks.append(file_chunk)
-    return all_chunks
+    return [
+        (offset, min(new_part_size, file_size - offset))
+        for offset in range(0, file_size, new_part_size)
+    ]
+
+
+def compute_multipart_etag(parts_md5_digests):
+    """
+    Compute the ETag S3 gives to a multipart object,
+    which is the MD5 of the concatenated parts MD5s followed by the parts count
+
+    Args:
+        parts_md5_digests (list): The binary MD5 digests of the parts,
+            ordered by part number
+
+    Returns:
+        str: The expected ETag of the multipart object, without quotes
+
+    """
+    etag_md5 = hashlib.md5(b"".join(parts_md5_digests)).hexdigest()
+    return f"{etag_md5}-{len(parts_md5_digests)}"
+
+
+def compute_file_multipart_etag(file_name, part_size):
+    """
+    Compute the ETag S3 gives to an object uploaded from a file
+    in parts of the given size
+
+    Args:
+        file_name (str): Name of the uploaded file
+        part_size (str): The size of the uploaded parts, e.g. "16M"
+
+    Returns:
+        str: The expected ETag of the multipart object, without quotes
+
+    """
+    parts_md5_digests = []
+    # Hash the parts straight from the mapped file,
+    # without copying them into bytes objects
+    with open(file_name, "rb") as file_obj, mmap.mmap(
+        file_obj.fileno(), 0, access=mmap.ACCESS_READ
+    ) as file_mmap, memoryview(file_mmap) as file_view:
+        for offset, length in get_file_part_ranges(file_name, part_size):
+            with file_view[offset : offset + length] as part_view:
+                parts_md5_digests.append(hashlib.md5(part_view).digest())
+    return compute_multipart_etag(parts_md5_digests)
 
 
 def generate_random_key(length=20):
@@ -133,15 +308,45 @@ def generate_random_key(length=20):
     mandatory_chars.append(random.choice(string.digits))
 
     # Generate the rest of the key and make sure it doesn't contain any invalid characters
-    invalid_chars = ["\\", "/", " ", '"', "'"]
-    valid_special_characters = "".join(
-        ch for ch in string.punctuation if ch not in invalid_chars
-    )
-    valid_characters = string.ascii_letters + string.digits + valid_special_characters
-    key_chars = random.choices(valid_characters, k=length - len(mandatory_chars))
+    key_chars = random.choices(VALID_KEY_CHARS, k=length - len(mandatory_chars))
 
     # Add the mandatory characters to random positions in the key
     for ch in mandatory_chars:
         key_chars.insert(random.randint(0, len(key_chars)), ch)
 
     return "".join(key_chars)
+
+
+@functools.lru_cache(maxsize=None)
+def get_jinja_environment(base_path):
+    """
+    Get a Jinja environment for the given templates directory.
+    The environment is created once per directory and keeps every template
+    compiled after its first use.
+
+    Args:
+        base_path (str): The full path of the templates directory
+
+    Returns:
+        jinja2.Environment: The Jinja environment
+
+    """
+    return Environment(
+        loader=FileSystemLoader(base_path), cache_size=-1, auto_reload=False
+    )
+
+
+def render_template(template_name, data):
+    """
+    Render a template from the CI's templates directory
+
+    Args:
+        template_name (str): The name of the template file
+        data (dict): The data to render the template with
+
+    Returns:
+        str: The rendered template
+
+    """
+    jinja_env = get_jinja_environment(config.ENV_DATA["template_dir"])
+    return jinja_env.get_template(template_name).render(data)